@@ -2,10 +2,10 @@ import fs from 'fs';
 import path from 'path';
 import os from 'os';
 import { execSync } from 'child_process';
-import { d1Exec } from './d1.js';
+import { d1Exec, d1InsertPlays, PLAYS_PER_INSERT } from './d1.js';
 
 const MIN_MS = 30_000;
-const BATCH  = 14; // 14 rows × 7 params = 98, under D1's 100-variable statement limit
+const BATCH  = PLAYS_PER_INSERT;
 
 // ---------------------------------------------------------------------------
 // CSV parser (handles quoted fields with embedded commas/newlines)
@@ -183,6 +183,12 @@ function syntheticUri(artist, track) {
 // ---------------------------------------------------------------------------
 // File finder
 // ---------------------------------------------------------------------------
+// Apple Music *.csv whose name mentions play/activity/history/listen, minus
+// the click/container/statistics exports
+const APPLE_MUSIC_RE = /apple.music/i;
+const PLAY_WORD_RE   = /play|activity|history|listen/i;
+const NOT_PLAY_RE    = /click|container|statistics/i;
+
 function collectCsvFiles(dir) {
   const results = [];
   function walk(d) {
@@ -191,11 +197,9 @@ function collectCsvFiles(dir) {
       if (entry.isDirectory()) walk(full);
       else if (
         entry.name.endsWith('.csv') &&
-        /apple.music/i.test(entry.name) &&
-        /play|activity|history|listen/i.test(entry.name) &&
-        !/click/i.test(entry.name) &&
-        !/container/i.test(entry.name) &&
-        !/statistics/i.test(entry.name)
+        APPLE_MUSIC_RE.test(entry.name) &&
+        PLAY_WORD_RE.test(entry.name) &&
+        !NOT_PLAY_RE.test(entry.name)
       ) results.push(full);
     }
   }
@@ -324,31 +328,21 @@ export async function runAppleImport(inputPath) {
       const baseDate = new Date(played_at);
       for (let k = 0; k < playCount; k++) {
         const d = new Date(baseDate.getTime() + k * 1000);
-        records.push({
-          played_at:   d.toISOString(),
-          track_uri:   syntheticUri(artistName, trackName),
-          track_name:  trackName,
-          artist_name: artistName,
-          album_name:  albumRaw || null,
-          ms_played:   perPlayMs,
-          source:      'apple_music',
-        });
+        records.push([
+          d.toISOString(),
+          syntheticUri(artistName, trackName),
+          trackName,
+          artistName,
+          albumRaw || null,
+          perPlayMs,
+          'apple_music',
+        ]);
       }
     }
 
     // Batch insert into D1
     for (let i = 0; i < records.length; i += BATCH) {
-      const batch = records.slice(i, i + BATCH);
-      const placeholders = batch.map(() => '(?,?,?,?,?,?,?)').join(',');
-      const params = batch.flatMap(r => [
-        r.played_at, r.track_uri, r.track_name, r.artist_name,
-        r.album_name, r.ms_played, r.source,
-      ]);
-      const result = await d1Exec(
-        `INSERT OR IGNORE INTO plays (played_at, track_uri, track_name, artist_name, album_name, ms_played, source) VALUES ${placeholders}`,
-        params,
-      );
-      inserted += result.changes;
+      inserted += await d1InsertPlays(records.slice(i, i + BATCH));
       const pct = Math.round(((i + BATCH) / records.length) * 100);
       process.stdout.write(`\r  ${path.basename(file)}: ${Math.min(pct, 100)}%`);
     }
@@ -357,6 +351,9 @@ export async function runAppleImport(inputPath) {
 
   if (tmpDir) fs.rmSync(tmpDir, { recursive: true });
 
+  // Refresh planner statistics so the stats indexes keep getting picked
+  if (inserted > 0) await d1Exec('PRAGMA optimize');
+
   console.log(`\nApple Music import complete.`);
   console.log(`  Total rows:          ${totalRows.toLocaleString()}`);
   console.log(`  Inserted:            ${inserted.toLocaleString()}`);
@@ -1,12 +1,9 @@
-import React from 'react';
-import { render } from 'ink';
 import { program } from 'commander';
 import { fileURLToPath } from 'url';
 import path from 'path';
 import fs from 'fs';
 import os from 'os';
 import { execSync } from 'child_process';
-import App from './tui/app.jsx';
 
 // Project root = parent of dist/ (where this bundle lives)
 const PROJECT_ROOT = path.dirname(path.dirname(fileURLToPath(import.meta.url)));
@@ -25,7 +22,12 @@ program
 program
   .command('tui')
   .description('Launch the interactive TUI')
-  .action(() => {
+  .action(async () => {
+    // React/Ink (and the stats layer behind the tabs) are only loaded here so
+    // that --help and the non-TUI commands don't pay for them at startup.
+    const React = (await import('react')).default;
+    const { render } = await import('ink');
+    const { default: App } = await import('./tui/app.jsx');
     render(<App />, { fullscreen: true });
   });
 
@@ -38,11 +40,16 @@ program
   .action(async () => {
     const { summaryStats, msToHuman } = await import('./stats.js');
     const s = await summaryStats();
-    console.log(`Today: ${msToHuman(s.todayMs)}`);
-    console.log(`Streak: ${s.streaks.currentStreak} days (longest: ${s.streaks.longestStreak})`);
-    console.log(`${s.yearly.year} YTD: ${msToHuman(s.yearly.totalMs)} — ${s.yearly.totalPlays.toLocaleString()} plays`);
-    console.log('\nTop Artists (30d):');
-    s.topArtists30d.forEach((a, i) => console.log(`  ${i + 1}. ${a.artistName} — ${msToHuman(a.totalMs)}`));
+    // Build the whole report first and write it in one go
+    const lines = [
+      `Today: ${msToHuman(s.todayMs)}`,
+      `Streak: ${s.streaks.currentStreak} days (longest: ${s.streaks.longestStreak})`,
+      `${s.yearly.year} YTD: ${msToHuman(s.yearly.totalMs)} — ${s.yearly.totalPlays.toLocaleString()} plays`,
+      '',
+      'Top Artists (30d):',
+      ...s.topArtists30d.map((a, i) => `  ${i + 1}. ${a.artistName} — ${msToHuman(a.totalMs)}`),
+    ];
+    process.stdout.write(lines.join('\n') + '\n');
   });
 
 // ------------------------------------------------------------------
@@ -161,6 +168,7 @@ cf
       const rows = await d1Query('SELECT COUNT(*) AS n FROM plays');
       console.log(`Connection OK — ${(rows[0]?.n ?? 0).toLocaleString()} plays in database.`);
       console.log(`Config saved to ${path.join(DATA_DIR, 'cloudflare.json')}`);
+      console.log('Apply the schema with:  level13 cf migrate');
     } catch (err) {
       console.error(`Connection failed: ${err.message}`);
       process.exit(1);
@@ -175,11 +183,20 @@ cf
     execSync(`npx wrangler deploy --cwd "${workerDir}"`, { stdio: 'inherit' });
   });
 
+cf
+  .command('migrate')
+  .description('Apply schema.sql (tables, indexes, plays_daily rollup) to D1 via wrangler')
+  .action(() => {
+    const workerDir  = path.join(PROJECT_ROOT, 'worker');
+    const schemaFile = path.join(PROJECT_ROOT, 'schema.sql');
+    execSync(`npx wrangler d1 execute level13 --remote --file "${schemaFile}" --cwd "${workerDir}"`, { stdio: 'inherit' });
+  });
+
 cf
   .command('migrate-local')
   .description('One-time migration: copy local SQLite plays to D1')
   .action(async () => {
-    const { d1Exec } = await import('./d1.js');
+    const { d1Exec, d1InsertPlays, PLAYS_PER_INSERT } = await import('./d1.js');
     const Database = (await import('better-sqlite3')).default;
 
     if (!fs.existsSync(DB_PATH)) {
@@ -195,20 +212,14 @@ cf
     console.log(`Found ${plays.length.toLocaleString()} plays in local database.`);
 
     let inserted = 0;
-    const BATCH = 40; // 40 rows × 7 params = 280 — under D1 REST API ~342-variable limit
+    const BATCH = PLAYS_PER_INSERT;
 
     for (let i = 0; i < plays.length; i += BATCH) {
-      const batch = plays.slice(i, i + BATCH);
-      const placeholders = batch.map(() => '(?,?,?,?,?,?,?)').join(',');
-      const params = batch.flatMap(r => [
+      const batch = plays.slice(i, i + BATCH).map(r => [
         r.played_at, r.track_uri, r.track_name, r.artist_name,
         r.album_name, r.ms_played, r.source,
       ]);
-      const result = await d1Exec(
-        `INSERT OR IGNORE INTO plays (played_at, track_uri, track_name, artist_name, album_name, ms_played, source) VALUES ${placeholders}`,
-        params,
-      );
-      inserted += result.changes;
+      inserted += await d1InsertPlays(batch);
       const pct = Math.round(((i + BATCH) / plays.length) * 100);
       process.stdout.write(`\r  Progress: ${Math.min(pct, 100)}%`);
     }
@@ -1,14 +1,28 @@
 import { loadCloudflareConfig } from './config.js';
 
-async function _d1Request(sql, params = []) {
-  const { accountId, databaseId, apiToken } = loadCloudflareConfig();
-  const url = `https://api.cloudflare.com/client/v4/accounts/${accountId}/d1/database/${databaseId}/query`;
-  const res = await fetch(url, {
+// Config is read once, on the first request
+let _endpoint = null;
+
+function endpoint() {
+  if (!_endpoint) {
+    const { accountId, databaseId, apiToken } = loadCloudflareConfig();
+    _endpoint = {
+      base: `https://api.cloudflare.com/client/v4/accounts/${accountId}/d1/database/${databaseId}`,
+      headers: {
+        'Authorization': `Bearer ${apiToken}`,
+        'Content-Type': 'application/json',
+      },
+    };
+  }
+  return _endpoint;
+}
+
+// `method` is the API route: 'query' returns rows as objects, 'raw' as arrays
+async function _d1Request(sql, params = [], method = 'query') {
+  const { base, headers } = endpoint();
+  const res = await fetch(`${base}/${method}`, {
     method: 'POST',
-    headers: {
-      'Authorization': `Bearer ${apiToken}`,
-      'Content-Type': 'application/json',
-    },
+    headers,
     body: JSON.stringify({ sql, params }),
   });
   if (!res.ok) {
@@ -27,7 +41,31 @@ export async function d1Query(sql, params = []) {
   return result?.results ?? [];
 }
 
+// Rows as positional arrays in SELECT column order
+export async function d1QueryRaw(sql, params = []) {
+  const result = await _d1Request(sql, params, 'raw');
+  return result?.results?.rows ?? [];
+}
+
 export async function d1Exec(sql, params = []) {
   const result = await _d1Request(sql, params);
   return { changes: result?.meta?.changes ?? 0 };
 }
+
+// Rows per d1InsertPlays() call: one JSON param, far below D1's 2 MB limit
+export const PLAYS_PER_INSERT = 500;
+
+// Rows are 7-tuples in column order:
+//   [played_at, track_uri, track_name, artist_name, album_name, ms_played, source]
+// One INSERT ... SELECT over json_each(); returns how many rows were new
+export async function d1InsertPlays(rows) {
+  if (rows.length === 0) return 0;
+  const { changes } = await d1Exec(`
+    INSERT OR IGNORE INTO plays (played_at, track_uri, track_name, artist_name, album_name, ms_played, source)
+    SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]'), json_extract(value, '$[2]'),
+           json_extract(value, '$[3]'), json_extract(value, '$[4]'), json_extract(value, '$[5]'),
+           json_extract(value, '$[6]')
+    FROM json_each(?)
+  `, [JSON.stringify(rows)]);
+  return changes;
+}
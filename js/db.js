@@ -4,48 +4,85 @@ import { DATA_DIR, DB_PATH, DEFAULT_MS_PER_PLAY } from './config.js';
 
 fs.mkdirSync(DATA_DIR, { recursive: true });
 
+// Bump SCHEMA_VERSION whenever SCHEMA changes so existing databases re-run it.
+// Stats live in D1; locally only played_at is indexed, for migrate-local.
+const SCHEMA_VERSION = 5;
+const SCHEMA = `
+CREATE TABLE IF NOT EXISTS plays (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  played_at TEXT NOT NULL,
+  track_uri TEXT,
+  track_name TEXT,
+  artist_name TEXT,
+  album_name TEXT,
+  ms_played INTEGER,
+  source TEXT NOT NULL DEFAULT 'api',
+  UNIQUE(played_at, track_uri)
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+  key TEXT PRIMARY KEY,
+  value TEXT NOT NULL
+);
+DROP INDEX IF EXISTS idx_plays_played_at;
+CREATE INDEX IF NOT EXISTS idx_plays_played_at_ms ON plays(played_at, ms_played);
+DROP INDEX IF EXISTS idx_plays_artist;
+DROP INDEX IF EXISTS idx_plays_track;
+DROP INDEX IF EXISTS idx_plays_day;
+DROP INDEX IF EXISTS idx_plays_day_ms;
+`;
+
 let _db = null;
 
 export function getDb() {
   if (_db) return _db;
-  _db = new Database(DB_PATH);
+  // Busy timeout, so the poller and an ad-hoc reader wait on each other
+  _db = new Database(DB_PATH, { timeout: 5000 });
   _db.pragma('journal_mode = WAL');
+  // NORMAL is durable under WAL and skips the fsync per transaction
+  _db.pragma('synchronous = NORMAL');
+  _db.pragma('temp_store = MEMORY');
+  _db.pragma('cache_size = -65536'); // 64 MB
+  _db.pragma('mmap_size = 268435456'); // 256 MB
   _db.pragma('foreign_keys = ON');
-  _db.exec(`
-    CREATE TABLE IF NOT EXISTS plays (
-      id INTEGER PRIMARY KEY AUTOINCREMENT,
-      played_at TEXT NOT NULL,
-      track_uri TEXT,
-      track_name TEXT,
-      artist_name TEXT,
-      album_name TEXT,
-      ms_played INTEGER,
-      source TEXT NOT NULL DEFAULT 'api',
-      UNIQUE(played_at, track_uri)
-    );
-    CREATE TABLE IF NOT EXISTS sync_state (
-      key TEXT PRIMARY KEY,
-      value TEXT NOT NULL
-    );
-    CREATE INDEX IF NOT EXISTS idx_plays_played_at ON plays(played_at);
-  `);
+  // Run the DDL only when the database is behind SCHEMA_VERSION
+  if (_db.pragma('user_version', { simple: true }) < SCHEMA_VERSION) {
+    _db.exec(SCHEMA);
+    _db.pragma(`user_version = ${SCHEMA_VERSION}`);
+  }
   return _db;
 }
 
-export function insertPlay(play) {
-  const db = getDb();
-  db.prepare(`
-    INSERT OR IGNORE INTO plays (played_at, track_uri, track_name, artist_name, album_name, ms_played, source)
-    VALUES (@played_at, @track_uri, @track_name, @artist_name, @album_name, @ms_played, @source)
-  `).run(play);
+let _insertMany = null;
+
+// Inserts all plays in a single transaction; returns how many were new
+export function insertPlays(plays) {
+  if (!_insertMany) {
+    const stmt = getDb().prepare(`
+      INSERT OR IGNORE INTO plays (played_at, track_uri, track_name, artist_name, album_name, ms_played, source)
+      VALUES (@played_at, @track_uri, @track_name, @artist_name, @album_name, @ms_played, @source)
+    `);
+    _insertMany = getDb().transaction((rows) => {
+      let inserted = 0;
+      for (const play of rows) inserted += stmt.run(play).changes;
+      return inserted;
+    });
+  }
+  return _insertMany(plays);
 }
 
+let _getSyncStmt = null;
+let _setSyncStmt = null;
+
 export function getSyncState(key) {
-  const db = getDb();
-  return db.prepare('SELECT value FROM sync_state WHERE key = ?').get(key)?.value ?? null;
+  if (!_getSyncStmt) {
+    _getSyncStmt = getDb().prepare('SELECT value FROM sync_state WHERE key = ?').pluck();
+  }
+  return _getSyncStmt.get(key) ?? null;
 }
 
 export function setSyncState(key, value) {
-  const db = getDb();
-  db.prepare('INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)').run(key, value);
+  if (!_setSyncStmt) {
+    _setSyncStmt = getDb().prepare('INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)');
+  }
+  _setSyncStmt.run(key, value);
 }
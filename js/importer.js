@@ -2,25 +2,89 @@ import fs from 'fs';
 import path from 'path';
 import os from 'os';
 import { execSync } from 'child_process';
-import { d1Exec } from './d1.js';
+import { d1Query, d1Exec, d1InsertPlays, PLAYS_PER_INSERT } from './d1.js';
 
 const MIN_MS = 30_000; // skip plays shorter than 30 seconds
+const HISTORY_FILE_RE = /^(Streaming_History_Audio_|endsong_).*\.json$/i;
 
+// Maps an export record straight to an insert tuple (see d1InsertPlays), or
+// null for records that aren't imported (no timestamp, or under MIN_MS)
 function mapRecord(r) {
-  return {
-    played_at:   r.ts,
-    track_uri:   r.spotify_track_uri ?? null,
-    track_name:  r.master_metadata_track_name ?? null,
-    artist_name: r.master_metadata_album_artist_name ?? null,
-    album_name:  r.master_metadata_album_album_name ?? null,
-    ms_played:   r.ms_played ?? null,
-    source:      'import',
-  };
+  const {
+    ts, ms_played, spotify_track_uri, master_metadata_track_name,
+    master_metadata_album_artist_name, master_metadata_album_album_name,
+  } = r;
+  if (!ts || (ms_played ?? MIN_MS) < MIN_MS) return null;
+  return [
+    ts,
+    spotify_track_uri ?? null,
+    master_metadata_track_name ?? null,
+    master_metadata_album_artist_name ?? null,
+    master_metadata_album_album_name ?? null,
+    ms_played ?? null,
+    'import',
+  ];
+}
+
+// Yields the raw JSON text of each object in a top-level JSON array, streamed
+async function* streamArrayElements(stream) {
+  let depth = 0, inString = false, escaped = false, isArray = false;
+  let partial = ''; // text of an element that straddles a chunk boundary
+  for await (const chunk of stream) {
+    let start = partial ? 0 : -1;
+    for (let i = 0; i < chunk.length; i++) {
+      const ch = chunk[i];
+      if (inString) {
+        if (escaped) escaped = false;
+        else if (ch === '\\') escaped = true;
+        else if (ch === '"') inString = false;
+      } else if (ch === '"') {
+        inString = true;
+      } else if (ch === '{' || ch === '[') {
+        if (depth === 0) isArray = ch === '[';
+        else if (depth === 1 && isArray) start = i;
+        depth++;
+      } else if (ch === '}' || ch === ']') {
+        depth--;
+        if (depth === 1 && start >= 0) {
+          yield partial + chunk.slice(start, i + 1);
+          partial = '';
+          start = -1;
+        }
+      }
+    }
+    if (start >= 0) partial += chunk.slice(start);
+  }
+}
+
+// One JSON.parse per group of records
+async function* decodeRecords(stream, groupSize = 500) {
+  let group = [];
+  for await (const text of streamArrayElements(stream)) {
+    group.push(text);
+    if (group.length === groupSize) {
+      yield* JSON.parse(`[${group.join(',')}]`);
+      group = [];
+    }
+  }
+  if (group.length) yield* JSON.parse(`[${group.join(',')}]`);
 }
 
-function parseRecords(file) {
-  const raw = JSON.parse(fs.readFileSync(file, 'utf8'));
-  return Array.isArray(raw) ? raw : [];
+// Keys of plays already in D1. NULL track_uri rows are left out: UNIQUE
+// never treats them as duplicates.
+async function loadExistingKeys() {
+  const PAGE = 10_000;
+  const keys = new Set();
+  let lastId = 0;
+  for (;;) {
+    const rows = await d1Query(
+      'SELECT id, played_at, track_uri FROM plays WHERE id > ? AND track_uri IS NOT NULL ORDER BY id LIMIT ?',
+      [lastId, PAGE],
+    );
+    for (const r of rows) keys.add(`${r.played_at}|${r.track_uri}`);
+    if (rows.length < PAGE) return keys;
+    lastId = rows[rows.length - 1].id;
+  }
 }
 
 function collectJsonFiles(dir) {
@@ -30,7 +94,7 @@ function collectJsonFiles(dir) {
       const full = path.join(d, entry.name);
       if (entry.isDirectory()) {
         walk(full);
-      } else if (/^(Streaming_History_Audio_|endsong_).*\.json$/i.test(entry.name)) {
+      } else if (HISTORY_FILE_RE.test(entry.name)) {
         results.push(full);
       }
     }
@@ -62,40 +126,59 @@ export async function runImport(inputPath) {
 
   console.log(`Found ${jsonFiles.length} history file(s).`);
 
+  process.stdout.write('Loading existing plays ...');
+  const existing = await loadExistingKeys();
+  process.stdout.write(` ${existing.size.toLocaleString()}\n`);
+
   let total = 0;
   let inserted = 0;
 
-  const BATCH = 40; // 40 rows × 7 params = 280 params — under D1 REST API ~342-variable limit
+  const BATCH = PLAYS_PER_INSERT;
+  const MAX_IN_FLIGHT = 4; // keep decoding while earlier batches are on the wire
+
+  const inFlight = new Set();
+  const send = (rows) => {
+    const p = d1InsertPlays(rows).then(n => { inserted += n; inFlight.delete(p); });
+    p.catch(() => {}); // surfaced by the race/all below
+    inFlight.add(p);
+  };
 
   for (const file of jsonFiles) {
-    const records = parseRecords(file);
-    total += records.length;
-
-    // Pre-filter before batching
-    const valid = records
-      .filter(r => (r.ms_played ?? MIN_MS) >= MIN_MS && r.ts)
-      .map(mapRecord);
-
-    for (let i = 0; i < valid.length; i += BATCH) {
-      const batch = valid.slice(i, i + BATCH);
-      const placeholders = batch.map(() => '(?,?,?,?,?,?,?)').join(',');
-      const params = batch.flatMap(r => [
-        r.played_at, r.track_uri, r.track_name, r.artist_name,
-        r.album_name, r.ms_played, r.source,
-      ]);
-      const result = await d1Exec(
-        `INSERT OR IGNORE INTO plays (played_at, track_uri, track_name, artist_name, album_name, ms_played, source) VALUES ${placeholders}`,
-        params,
-      );
-      inserted += result.changes;
-      const pct = Math.round(((i + BATCH) / valid.length) * 100);
-      process.stdout.write(`\r  ${path.basename(file)}: ${Math.min(pct, 100)}%`);
+    const name = path.basename(file);
+    const size = fs.statSync(file).size || 1;
+    const stream = fs.createReadStream(file, { encoding: 'utf8' });
+    let batch = [];
+
+    const flush = async () => {
+      send(batch);
+      batch = [];
+      if (inFlight.size >= MAX_IN_FLIGHT) await Promise.race(inFlight);
+      const pct = Math.round((stream.bytesRead / size) * 100);
+      process.stdout.write(`\r  ${name}: ${Math.min(pct, 100)}%`);
+    };
+
+    for await (const r of decodeRecords(stream)) {
+      total++;
+      const row = mapRecord(r);
+      if (!row) continue;
+      if (row[1] !== null) {
+        const key = `${row[0]}|${row[1]}`;
+        if (existing.has(key)) continue;
+        existing.add(key);
+      }
+      batch.push(row);
+      if (batch.length === BATCH) await flush();
     }
-    process.stdout.write('\n');
+    if (batch.length) await flush();
+    await Promise.all(inFlight);
+    process.stdout.write(`\r  ${name}: 100%\n`);
   }
 
   if (tmpDir) fs.rmSync(tmpDir, { recursive: true });
 
+  // Refresh planner statistics
+  if (inserted > 0) await d1Exec('PRAGMA optimize');
+
   console.log(`\nImport complete.`);
   console.log(`  Total records: ${total.toLocaleString()}`);
   console.log(`  Inserted:      ${inserted.toLocaleString()}`);
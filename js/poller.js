@@ -4,9 +4,10 @@
 process.title = 'level13-poller';
 
 import fs from 'fs';
+import { setTimeout as delay } from 'timers/promises';
 import { DATA_DIR, PID_FILE, LOG_FILE, POLL_INTERVAL_MS } from './config.js';
 import { createSpotifyClient, refreshIfNeeded } from './auth.js';
-import { getDb, insertPlay, getSyncState, setSyncState } from './db.js';
+import { getDb, insertPlays, getSyncState, setSyncState } from './db.js';
 
 // ------------------------------------------------------------------
 // PID file
@@ -18,8 +19,17 @@ function cleanup() {
   try { fs.unlinkSync(PID_FILE); } catch { /* already gone */ }
 }
 
-process.on('SIGTERM', () => { cleanup(); process.exit(0); });
-process.on('SIGINT',  () => { cleanup(); process.exit(0); });
+// A signal ends the sleep and lets a running poll commit; a second signal,
+// or a poll still stuck after the grace period, exits immediately.
+const SHUTDOWN_GRACE_MS = 10_000;
+const shutdown = new AbortController();
+function onSignal() {
+  if (shutdown.signal.aborted) process.exit(0);
+  shutdown.abort();
+  setTimeout(() => process.exit(0), SHUTDOWN_GRACE_MS).unref();
+}
+process.on('SIGTERM', onSignal);
+process.on('SIGINT',  onSignal);
 process.on('exit',    () => cleanup());
 
 // ------------------------------------------------------------------
@@ -35,6 +45,19 @@ function log(...args) {
 // ------------------------------------------------------------------
 const spotify = createSpotifyClient();
 
+// Fixed-width Spotify timestamps are sliced directly; others use Date.parse
+function tsToMs(s) {
+  if ((s.length === 24 || s.length === 20) && s[10] === 'T' && s[s.length - 1] === 'Z') {
+    const mo = +s.slice(5, 7), d = +s.slice(8, 10);
+    const h = +s.slice(11, 13), mi = +s.slice(14, 16), sec = +s.slice(17, 19);
+    if (mo >= 1 && mo <= 12 && d >= 1 && d <= 31 && h < 24 && mi < 60 && sec < 60) {
+      const ms = Date.UTC(+s.slice(0, 4), mo - 1, d, h, mi, sec, s.length === 24 ? +s.slice(20, 23) : 0);
+      if (!Number.isNaN(ms)) return ms;
+    }
+  }
+  return Date.parse(s);
+}
+
 async function poll() {
   await refreshIfNeeded(spotify);
 
@@ -42,48 +65,50 @@ async function poll() {
   const opts = { limit: 50 };
   if (cursor) {
     // Spotify `after` param is a Unix timestamp in milliseconds
-    opts.after = new Date(cursor).getTime();
+    opts.after = tsToMs(cursor);
   }
 
   const data = await spotify.getMyRecentlyPlayedTracks(opts);
-  const items = data.body.items || [];
+  // The cursor is ms-resolution, so drop plays at or before it
+  const items = (data.body.items || []).filter(it => !cursor || it.played_at > cursor);
   if (items.length === 0) {
     log('Poll: no new tracks');
     return;
   }
 
-  const db = getDb();
-  const insertMany = db.transaction((rows) => {
-    for (const item of rows) {
-      insertPlay({
-        played_at:   item.played_at,
-        track_uri:   item.track.uri,
-        track_name:  item.track.name,
-        artist_name: item.track.artists[0]?.name ?? 'Unknown',
-        album_name:  item.track.album?.name ?? '',
-        ms_played:   null,
-        source:      'api',
-      });
-    }
-  });
-  insertMany(items);
+  const plays = items.map(item => ({
+    played_at:   item.played_at,
+    track_uri:   item.track.uri,
+    track_name:  item.track.name,
+    artist_name: item.track.artists[0]?.name ?? 'Unknown',
+    album_name:  item.track.album?.name ?? '',
+    ms_played:   null,
+    source:      'api',
+  }));
+
+  // cursor = newest play's timestamp
+  let newest = plays[0].played_at;
+  for (const p of plays) if (p.played_at > newest) newest = p.played_at;
 
-  // items are newest-first; cursor = newest play's timestamp
-  const newest = items[0].played_at;
-  setSyncState('last_poll_cursor', newest);
-  log(`Poll: inserted up to ${items.length} tracks (newest: ${newest})`);
+  // Plays and cursor commit together: one WAL commit per poll
+  const inserted = getDb().transaction(() => {
+    const n = insertPlays(plays);
+    setSyncState('last_poll_cursor', newest);
+    return n;
+  })();
+  log(`Poll: inserted ${inserted} of ${items.length} tracks (newest: ${newest})`);
 }
 
 // ------------------------------------------------------------------
 // Main loop
 // ------------------------------------------------------------------
 function sleep(ms) {
-  return new Promise(resolve => setTimeout(resolve, ms));
+  return delay(ms, undefined, { signal: shutdown.signal }).catch(() => {});
 }
 
 async function run() {
   log(`Poller started (PID ${process.pid})`);
-  while (true) {
+  while (!shutdown.signal.aborted) {
     try {
       await poll();
     } catch (err) {
@@ -99,9 +124,10 @@ async function run() {
     }
     await sleep(POLL_INTERVAL_MS);
   }
+  log('Poller stopped');
 }
 
-run().catch(err => {
+run().then(() => process.exit(0), err => {
   log(`Fatal: ${err.message}`);
   process.exit(1);
 });
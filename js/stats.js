@@ -1,177 +1,267 @@
-import { d1Query } from './d1.js';
+import { d1Query, d1QueryRaw } from './d1.js';
 import { DEFAULT_MS_PER_PLAY } from './config.js';
 
-const MS_EXPR = `COALESCE(ms_played, ${DEFAULT_MS_PER_PLAY})`;
+// Aggregates read plays_daily, the trigger-maintained rollup in schema.sql
+const MS_EXPR = `known_ms + null_ms_count * ${DEFAULT_MS_PER_PLAY}`;
+// 1 if any play in the group has no recorded duration (boolean OR via MAX)
+const HAS_ESTIMATES_EXPR = 'MAX(null_ms_count > 0)';
 
 export function msToHuman(ms) {
-  const totalSec = Math.floor(ms / 1000);
-  const hours = Math.floor(totalSec / 3600);
-  const minutes = Math.floor((totalSec % 3600) / 60);
+  const totalMin = Math.floor(ms / 60000);
+  const hours = Math.floor(totalMin / 60);
+  const minutes = totalMin % 60;
   return hours ? `${hours}h ${minutes}m` : `${minutes}m`;
 }
 
-function timeRangeFilter(timeRange) {
-  if (timeRange === 'all') return { where: '1=1', params: [] };
-  const days = { '7d': 7, '30d': 30, '90d': 90, '365d': 365 }[timeRange];
-  if (!days) throw new Error(`Unknown time range: ${timeRange}`);
+// A day is the half-open range [day, nextDay(day)) on the ISO played_at text
+function nextDay(dateStr) {
+  return new Date(Date.parse(dateStr) + 86400000).toISOString().slice(0, 10);
+}
+
+// TTL cache of in-flight promises (failures evicted). Map order is age order:
+// each insert drops expired entries and, past CACHE_MAX, the oldest.
+const CACHE_TTL_MS = 60_000;
+const CACHE_MAX = 64;
+const _cache = new Map();
+
+function cachedQuery(name, fn) {
+  return (...args) => {
+    const key = `${name}|${JSON.stringify(args)}`;
+    const now = Date.now();
+    const hit = _cache.get(key);
+    if (hit && now - hit.at < CACHE_TTL_MS) return hit.promise;
+    const entry = { at: now, promise: fn(...args) };
+    entry.promise.catch(() => { if (_cache.get(key) === entry) _cache.delete(key); });
+    _cache.delete(key);
+    for (const [k, e] of _cache) {
+      if (now - e.at < CACHE_TTL_MS && _cache.size < CACHE_MAX) break;
+      _cache.delete(k);
+    }
+    _cache.set(key, entry);
+    return entry.promise;
+  };
+}
+
+export function clearStatsCache() {
+  _cache.clear();
+}
+
+const TIME_RANGE_DAYS = { '7d': 7, '30d': 30, '90d': 90, '365d': 365, 'all': null };
+
+// Rolling range: whole days from plays_daily, the partial first day from
+// plays. ?2 first whole day, ?3 cutoff
+const RANGE_SOURCE = `(
+  SELECT artist_name, track_name, play_count, known_ms, null_ms_count
+  FROM plays_daily WHERE day >= ?2
+  UNION ALL
+  SELECT artist_name, track_name, 1, IFNULL(ms_played, 0), ms_played IS NULL
+  FROM plays WHERE played_at >= ?3 AND played_at < ?2
+)`;
+
+// Bound params for RANGE_SOURCE, or none for 'all'
+function timeRangeParams(timeRange) {
+  if (!Object.hasOwn(TIME_RANGE_DAYS, timeRange)) throw new Error(`Unknown time range: ${timeRange}`);
+  const days = TIME_RANGE_DAYS[timeRange];
+  if (!days) return [];
   const cutoff = new Date(Date.now() - days * 86400000).toISOString();
-  return { where: 'played_at >= ?', params: [cutoff] };
+  return [nextDay(cutoff.slice(0, 10)), cutoff];
 }
 
-export async function dailyListeningTime(dateStr) {
+// SQL per time range, built once
+function sqlByTimeRange(build) {
+  return Object.fromEntries(Object.entries(TIME_RANGE_DAYS).map(([range, days]) =>
+    [range, build(days ? RANGE_SOURCE : 'plays_daily')]));
+}
+
+export const dailyListeningTime = cachedQuery('dailyListeningTime', async (dateStr) => {
   const rows = await d1Query(
-    `SELECT SUM(${MS_EXPR}) AS total FROM plays WHERE date(played_at) = ?`,
+    `SELECT SUM(${MS_EXPR}) AS total FROM plays_daily WHERE day = ?`,
     [dateStr],
   );
   return rows[0]?.total ?? 0;
-}
+});
 
-export async function topArtists(timeRange = '30d', limit = 20) {
-  const { where, params } = timeRangeFilter(timeRange);
-  const rows = await d1Query(`
-    SELECT artist_name, COUNT(*) AS play_count, SUM(${MS_EXPR}) AS total_ms,
-           SUM(CASE WHEN ms_played IS NULL THEN 1 ELSE 0 END) > 0 AS has_estimates
-    FROM plays WHERE ${where} AND artist_name IS NOT NULL
-    GROUP BY artist_name ORDER BY total_ms DESC LIMIT ?
-  `, [...params, limit]);
-  return rows.map(r => ({
-    artistName: r.artist_name, playCount: r.play_count,
-    totalMs: r.total_ms, estimated: !!r.has_estimates,
-  }));
+// Columns are aliased to the API names; only `estimated` needs coercing
+function withEstimatedFlag(rows) {
+  for (const r of rows) r.estimated = !!r.estimated;
+  return rows;
 }
 
-export async function topTracks(timeRange = '30d', limit = 20) {
-  const { where, params } = timeRangeFilter(timeRange);
-  const rows = await d1Query(`
-    SELECT track_name, artist_name, COUNT(*) AS play_count, SUM(${MS_EXPR}) AS total_ms,
-           SUM(CASE WHEN ms_played IS NULL THEN 1 ELSE 0 END) > 0 AS has_estimates
-    FROM plays WHERE ${where} AND track_name IS NOT NULL
-    GROUP BY track_name, artist_name ORDER BY total_ms DESC LIMIT ?
-  `, [...params, limit]);
-  return rows.map(r => ({
-    trackName: r.track_name, artistName: r.artist_name,
-    playCount: r.play_count, totalMs: r.total_ms, estimated: !!r.has_estimates,
-  }));
-}
+// ?1 is the row limit; a rolling range's bounds follow as ?2/?3
+const TOP_ARTISTS_SQL = sqlByTimeRange(source => `
+  SELECT artist_name AS artistName, SUM(play_count) AS playCount, SUM(${MS_EXPR}) AS totalMs,
+         ${HAS_ESTIMATES_EXPR} AS estimated
+  FROM ${source} WHERE artist_name IS NOT NULL
+  GROUP BY artist_name ORDER BY totalMs DESC LIMIT ?1
+`);
+
+export const topArtists = cachedQuery('topArtists', async (timeRange = '30d', limit = 20) => {
+  const params = timeRangeParams(timeRange);
+  return withEstimatedFlag(await d1Query(TOP_ARTISTS_SQL[timeRange], [limit, ...params]));
+});
+
+const TOP_TRACKS_SQL = sqlByTimeRange(source => `
+  SELECT track_name AS trackName, artist_name AS artistName, SUM(play_count) AS playCount,
+         SUM(${MS_EXPR}) AS totalMs, ${HAS_ESTIMATES_EXPR} AS estimated
+  FROM ${source} WHERE track_name IS NOT NULL
+  GROUP BY track_name, artist_name ORDER BY totalMs DESC LIMIT ?1
+`);
+
+export const topTracks = cachedQuery('topTracks', async (timeRange = '30d', limit = 20) => {
+  const params = timeRangeParams(timeRange);
+  return withEstimatedFlag(await d1Query(TOP_TRACKS_SQL[timeRange], [limit, ...params]));
+});
 
-export async function yearlyAggregate(year) {
+export const yearlyAggregate = cachedQuery('yearlyAggregate', async (year) => {
   const rows = await d1Query(`
-    SELECT COUNT(*) AS total_plays, SUM(${MS_EXPR}) AS total_ms,
+    SELECT SUM(play_count) AS total_plays, SUM(${MS_EXPR}) AS total_ms,
            COUNT(DISTINCT artist_name) AS unique_artists,
            COUNT(DISTINCT track_name) AS unique_tracks
-    FROM plays WHERE date(played_at) BETWEEN ? AND ?
-  `, [`${year}-01-01`, `${year}-12-31`]);
+    FROM plays_daily WHERE day >= ? AND day < ?
+  `, [`${year}-01-01`, `${year + 1}-01-01`]);
   const row = rows[0];
   return { year, totalPlays: row?.total_plays ?? 0, totalMs: row?.total_ms ?? 0,
            uniqueArtists: row?.unique_artists ?? 0, uniqueTracks: row?.unique_tracks ?? 0 };
-}
-
-export async function streak() {
-  const rows = await d1Query(
-    'SELECT DISTINCT date(played_at) AS day FROM plays ORDER BY day',
-  );
-  if (!rows.length) return { currentStreak: 0, longestStreak: 0 };
-
-  const days = rows.map(r => new Date(r.day));
-  let longest = 1, run = 1;
-  for (let i = 1; i < days.length; i++) {
-    const diff = (days[i] - days[i-1]) / 86400000;
-    if (diff === 1) { run++; longest = Math.max(longest, run); }
-    else run = 1;
-  }
+});
 
-  const daySet = new Set(rows.map(r => r.day));
-  const today = new Date().toISOString().slice(0, 10);
-  const yesterday = new Date(Date.now() - 86400000).toISOString().slice(0, 10);
-  let current = 0;
-  let d = daySet.has(today) ? today : (daySet.has(yesterday) ? yesterday : null);
-  while (d && daySet.has(d)) {
-    current++;
-    d = new Date(new Date(d).getTime() - 86400000).toISOString().slice(0, 10);
-  }
+// Gaps-and-islands: julianday(day) - ROW_NUMBER() is constant within a run
+const STREAK_CTES = `
+  streak_days AS (SELECT DISTINCT day FROM plays_daily),
+  streak_runs AS (
+    SELECT COUNT(*) AS len, MAX(day) AS last_day
+    FROM (SELECT day, julianday(day) - ROW_NUMBER() OVER (ORDER BY day) AS grp FROM streak_days)
+    GROUP BY grp
+  )`;
+// The current streak is the run that reaches today or yesterday (UTC)
+const STREAK_COLUMNS = `
+  (SELECT COALESCE(MAX(len), 0) FROM streak_runs) AS longest_streak,
+  (SELECT COALESCE(MAX(len), 0) FROM streak_runs
+    WHERE last_day >= date('now', '-1 day')) AS current_streak`;
 
-  return { currentStreak: current, longestStreak: Math.max(longest, current) };
-}
+export const streak = cachedQuery('streak', async () => {
+  const [row] = await d1Query(`WITH ${STREAK_CTES} SELECT ${STREAK_COLUMNS}`);
+  return { currentStreak: row?.current_streak ?? 0, longestStreak: row?.longest_streak ?? 0 };
+});
 
-export async function listeningByDay(start, end) {
+export const listeningByDay = cachedQuery('listeningByDay', async (start, end) => {
   return d1Query(`
-    SELECT date(played_at) AS day, SUM(${MS_EXPR}) AS total_ms, COUNT(*) AS play_count
-    FROM plays WHERE date(played_at) BETWEEN ? AND ?
+    SELECT day, SUM(${MS_EXPR}) AS total_ms, SUM(play_count) AS play_count
+    FROM plays_daily WHERE day BETWEEN ? AND ?
     GROUP BY day ORDER BY day
   `, [start, end]);
-}
+});
 
-export async function playsForDay(dateStr) {
+export const playsForDay = cachedQuery('playsForDay', async (dateStr) => {
   return d1Query(`
     SELECT played_at, track_name, artist_name, album_name, ms_played
-    FROM plays WHERE date(played_at) = ? ORDER BY played_at
-  `, [dateStr]);
-}
+    FROM plays WHERE played_at >= ? AND played_at < ? ORDER BY played_at
+  `, [dateStr, nextDay(dateStr)]);
+});
 
-export async function summaryStats() {
+// Params: ?1 today, ?2/?3 30-day RANGE_SOURCE bounds, ?4/?5 year bounds
+const SUMMARY_SQL = `
+  WITH recent AS (SELECT * FROM ${RANGE_SOURCE}), ${STREAK_CTES}
+  SELECT
+    (SELECT SUM(${MS_EXPR}) FROM plays_daily WHERE day = ?1) AS today_ms,
+    (SELECT json_group_array(json_object(
+              'artistName', artist_name, 'playCount', play_count,
+              'totalMs', total_ms, 'estimated', has_estimates))
+       FROM (SELECT artist_name, SUM(play_count) AS play_count, SUM(${MS_EXPR}) AS total_ms,
+                    ${HAS_ESTIMATES_EXPR} AS has_estimates
+             FROM recent WHERE artist_name IS NOT NULL
+             GROUP BY artist_name ORDER BY total_ms DESC LIMIT 10)) AS top_artists,
+    (SELECT json_group_array(json_object(
+              'trackName', track_name, 'artistName', artist_name, 'playCount', play_count,
+              'totalMs', total_ms, 'estimated', has_estimates))
+       FROM (SELECT track_name, artist_name, SUM(play_count) AS play_count, SUM(${MS_EXPR}) AS total_ms,
+                    ${HAS_ESTIMATES_EXPR} AS has_estimates
+             FROM recent WHERE track_name IS NOT NULL
+             GROUP BY track_name, artist_name ORDER BY total_ms DESC LIMIT 10)) AS top_tracks,
+    y.total_plays, y.total_ms, y.unique_artists, y.unique_tracks,
+    ${STREAK_COLUMNS}
+  FROM (SELECT SUM(play_count) AS total_plays, SUM(${MS_EXPR}) AS total_ms,
+               COUNT(DISTINCT artist_name) AS unique_artists,
+               COUNT(DISTINCT track_name) AS unique_tracks
+        FROM plays_daily WHERE day >= ?4 AND day < ?5) AS y
+`;
+
+export const summaryStats = cachedQuery('summaryStats', async () => {
   const today = new Date().toISOString().slice(0, 10);
   const year = new Date().getFullYear();
-  const [todayMs, topArtists30d, topTracks30d, yearly, streaks] = await Promise.all([
-    dailyListeningTime(today),
-    topArtists('30d', 10),
-    topTracks('30d', 10),
-    yearlyAggregate(year),
-    streak(),
+  const [row] = await d1Query(SUMMARY_SQL, [
+    today, ...timeRangeParams('30d'), `${year}-01-01`, `${year + 1}-01-01`,
   ]);
-  return { todayMs, topArtists30d, topTracks30d, yearly, streaks };
-}
 
-export async function artistDailyHistory(limit = 10) {
-  const boundsRows = await d1Query(
-    'SELECT MIN(date(played_at)) AS first, MAX(date(played_at)) AS last FROM plays',
-  );
-  const bounds = boundsRows[0];
-  if (!bounds?.first) return { days: [], artists: [] };
+  // json_group_array doesn't promise the subquery's order; re-sort the top-N
+  const byTotal = (a, b) => b.totalMs - a.totalMs;
+  const asTop = (json) => JSON.parse(json ?? '[]')
+    .map(r => ({ ...r, estimated: !!r.estimated }))
+    .sort(byTotal);
 
-  const { first, last } = bounds;
+  return {
+    todayMs: row?.today_ms ?? 0,
+    topArtists30d: asTop(row?.top_artists),
+    topTracks30d: asTop(row?.top_tracks),
+    yearly: {
+      year, totalPlays: row?.total_plays ?? 0, totalMs: row?.total_ms ?? 0,
+      uniqueArtists: row?.unique_artists ?? 0, uniqueTracks: row?.unique_tracks ?? 0,
+    },
+    streaks: { currentStreak: row?.current_streak ?? 0, longestStreak: row?.longest_streak ?? 0 },
+  };
+});
 
-  const top = await d1Query(`
+// Raw rows: [artist_name, total_ms, day_idx, ms, first, n_days]
+// MIN and MAX as separate subqueries, so each is a single index seek
+const FIRST_DAY = '(SELECT MIN(day) FROM plays_daily)';
+const LAST_DAY  = '(SELECT MAX(day) FROM plays_daily)';
+const HISTORY_SQL = `
+  WITH top AS (
     SELECT artist_name, SUM(${MS_EXPR}) AS total_ms
-    FROM plays WHERE artist_name IS NOT NULL
+    FROM plays_daily WHERE artist_name IS NOT NULL
     GROUP BY artist_name ORDER BY total_ms DESC LIMIT ?
-  `, [limit]);
-  if (!top.length) return { days: [], artists: [] };
+  )
+  SELECT d.artist_name, top.total_ms,
+         CAST(julianday(d.day) - julianday(${FIRST_DAY}) AS INTEGER) AS day_idx,
+         SUM(${MS_EXPR}) AS ms, ${FIRST_DAY} AS first,
+         CAST(julianday(${LAST_DAY}) - julianday(${FIRST_DAY}) AS INTEGER) + 1 AS n_days
+  FROM plays_daily d JOIN top ON top.artist_name = d.artist_name
+  GROUP BY d.artist_name, d.day
+`;
 
-  const topNames = top.map(r => r.artist_name);
-  const topTotals = Object.fromEntries(top.map(r => [r.artist_name, r.total_ms]));
+export const artistDailyHistory = cachedQuery('artistDailyHistory', async (limit = 10) => {
+  const rows = await d1QueryRaw(HISTORY_SQL, [limit]);
+  if (!rows.length) return { days: [], matrix: new Uint32Array(0), artists: [] };
 
-  const ph = topNames.map(() => '?').join(',');
-  const rows = await d1Query(`
-    SELECT artist_name, date(played_at) AS day, SUM(${MS_EXPR}) AS ms
-    FROM plays WHERE artist_name IN (${ph})
-    GROUP BY artist_name, day ORDER BY day
-  `, topNames);
-
-  // Build full day list
-  const days = [];
-  const d = new Date(first);
-  const endDate = new Date(last);
-  while (d <= endDate) {
-    days.push(d.toISOString().slice(0, 10));
-    d.setDate(d.getDate() + 1);
-  }
+  const [, , , , first, n] = rows[0];
+  const topTotals = new Map();
+  for (const [name, totalMs] of rows) topTotals.set(name, totalMs);
+  const topNames = [...topTotals.keys()].sort((a, b) => topTotals.get(b) - topTotals.get(a));
 
-  const dayIdx = Object.fromEntries(days.map((day, i) => [day, i]));
-  const n = days.length;
-  const artistData = Object.fromEntries(topNames.map(name => [name, new Float64Array(n)]));
-  for (const row of rows) {
-    const idx = dayIdx[row.day];
-    if (idx !== undefined && artistData[row.artist_name]) {
-      artistData[row.artist_name][idx] = row.ms;
-    }
+  const t0 = Date.parse(first);
+  const days = new Array(n);
+  for (let i = 0; i < n; i++) days[i] = new Date(t0 + i * 86400000).toISOString().slice(0, 10);
+
+  // artists × days matrix, dailyMs are row views; values clamped to Uint32
+  const rowOf = new Map(topNames.map((name, i) => [name, i]));
+  const matrix = new Uint32Array(topNames.length * n);
+  const peaks = new Uint32Array(topNames.length);
+  for (const [name, , idx, raw] of rows) {
+    if (idx < 0 || idx >= n) continue;
+    const r = rowOf.get(name);
+    const ms = Math.max(0, Math.min(Math.round(raw), 0xFFFFFFFF));
+    matrix[r * n + idx] = ms;
+    if (ms > peaks[r]) peaks[r] = ms;
   }
 
   return {
     days,
-    artists: topNames.map(name => ({
+    matrix,
+    artists: topNames.map((name, i) => ({
       name,
-      totalMs: topTotals[name],
-      dailyMs: Array.from(artistData[name]),
+      totalMs: topTotals.get(name),
+      totalStr: msToHuman(topTotals.get(name)),
+      peakMs: peaks[i],
+      dailyMs: matrix.subarray(i * n, (i + 1) * n),
     })),
   };
-}
+});
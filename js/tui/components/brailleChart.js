@@ -1,3 +1,5 @@
+import { msToHuman } from '../../stats.js';
+
 // Braille dot bit layout (offset from U+2800):
 //   Left col  → bits 0x01 0x02 0x04 0x40   (rows 0-3 top-bottom)
 //   Right col → bits 0x08 0x10 0x20 0x80
@@ -8,6 +10,18 @@ const BD = [
   [0x40, 0x80],
 ];
 
+// COL_FROM[wc][wr]: the dots of braille column wc (0 left, 1 right) from
+// dot row wr down to the bottom. COL_FROM[wc][0] is the whole column.
+const COL_FROM = [0, 1].map(wc => Uint8Array.from({ length: 4 }, (_, wr) => {
+  let mask = 0;
+  for (let k = wr; k < 4; k++) mask |= BD[k][wc];
+  return mask;
+}));
+
+// UTF-16 code unit per dot pattern; an empty cell is a space
+const GLYPH_CODES = Uint16Array.from({ length: 256 }, (_, bits) =>
+  bits ? 0x2800 + bits : 0x20);
+
 export const COLORS = [
   '#1DB954', '#5B9BD5', '#FF6B6B', '#FFD93D', '#C77DFF',
   '#06D6A0', '#FF4D6D', '#4CC9F0', '#F8961E', '#90BE6D',
@@ -18,41 +32,101 @@ export const ZOOM_DAYS  = { 0: null, 1: 365, 2: 182, 3: 91, 4: 30 };
 export const ZOOM_LABEL = { 0: 'all time', 1: '1 year', 2: '6 months', 3: '3 months', 4: '1 month' };
 export const LABEL_W = 24;
 
-// Gaussian max-spread in braille column space (σ=3)
-function gaussianSpread(sampled) {
-  const S = 3.0;
-  const weights = Array.from({ length: 10 }, (_, d) => Math.exp(-0.5 * (d / S) ** 2));
+// Gaussian max-spread in braille column space (σ=3), reaching 9 columns
+const SPREAD_REACH = 9;
+const SPREAD_WEIGHTS = Float64Array.from({ length: SPREAD_REACH + 1 },
+  (_, d) => Math.exp(-0.5 * (d / 3.0) ** 2));
+
+// Spreads `sampled` into `out`, which must be zeroed and the same length
+function gaussianSpread(sampled, out) {
   const n = sampled.length;
-  const out = new Float64Array(n);
   for (let i = 0; i < n; i++) {
     const v = sampled[i];
     if (v <= 0) continue;
     if (v > out[i]) out[i] = v;
-    for (let d = 1; d < 10; d++) {
-      const w = v * weights[d];
-      if (i + d < n && w > out[i + d]) out[i + d] = w;
-      if (i - d >= 0 && w > out[i - d]) out[i - d] = w;
+    // Reach clamped to the array bounds
+    const right = Math.min(SPREAD_REACH, n - 1 - i);
+    const left  = Math.min(SPREAD_REACH, i);
+    for (let d = 1; d <= right; d++) {
+      const w = v * SPREAD_WEIGHTS[d];
+      if (w > out[i + d]) out[i + d] = w;
+    }
+    for (let d = 1; d <= left; d++) {
+      const w = v * SPREAD_WEIGHTS[d];
+      if (w > out[i - d]) out[i - d] = w;
     }
   }
   return out;
 }
 
-function sampleMax(data, nCols) {
-  if (!data.length) return new Float64Array(nCols);
-  const nd = data.length;
-  const out = new Float64Array(nCols);
+// Exact integer bucket edges: column c covers days [edges[c], edges[c + 1])
+function bucketEdges(nd, nCols) {
+  const edges = new Int32Array(nCols + 1);
+  for (let c = 0; c <= nCols; c++) edges[c] = Math.floor(c * nd / nCols);
+  return edges;
+}
+
+// Max of each bucket of data into out (one entry per column)
+function sampleMax(data, edges, out) {
+  const nCols = out.length;
+  if (data.length <= nCols) {
+    // At most one day per column: each column just takes its day's value
+    for (let c = 0; c < nCols; c++) {
+      const v = data[edges[c]];
+      out[c] = v > 0 ? v : 0;
+    }
+    return out;
+  }
+  // More days than columns: every bucket is non-empty
   for (let c = 0; c < nCols; c++) {
-    let lo = Math.floor(c / nCols * nd);
-    let hi = Math.floor((c + 1) / nCols * nd);
-    if (lo >= hi) hi = lo + 1;
-    hi = Math.min(hi, nd);
+    const hi = edges[c + 1];
     let max = 0;
-    for (let i = lo; i < hi; i++) if (data[i] > max) max = data[i];
+    for (let i = edges[c]; i < hi; i++) if (data[i] > max) max = data[i];
     out[c] = max;
   }
   return out;
 }
 
+// Sampled + spread series of the first nRows matrix rows over [off, end);
+// row r (brCols wide) belongs to artists[r]
+function spreadRows(data, nRows, off, end, brCols) {
+  const n       = data.days.length;
+  const edges   = bucketEdges(end - off, brCols);
+  const sampled = new Float64Array(brCols);
+  const out     = new Float64Array(nRows * brCols);
+  for (let r = 0; r < nRows; r++) {
+    sampleMax(data.matrix.subarray(r * n + off, r * n + end), edges, sampled);
+    gaussianSpread(sampled, out.subarray(r * brCols, (r + 1) * brCols));
+  }
+  return out;
+}
+
+// Caller-owned per-viewport cache, cleared when the data changes. Shown
+// artists are a matrix-row prefix, so a larger entry serves fewer. Map order
+// is recency order.
+const SPREAD_CACHE_VIEWPORTS = 8;
+
+function viewSeries(cache, data, nRows, off, end, brCols) {
+  if (!cache) return spreadRows(data, nRows, off, end, brCols);
+  const key = `${off}|${end}|${brCols}`;
+  let entry = cache.get(key);
+  if (entry) cache.delete(key);
+  if (!entry || entry.nRows < nRows) {
+    entry = { nRows, series: spreadRows(data, nRows, off, end, brCols) };
+  }
+  cache.set(key, entry);
+  return entry.series;
+}
+
+function trimCache(cache) {
+  for (const key of cache.keys()) {
+    if (cache.size <= SPREAD_CACHE_VIEWPORTS) break;
+    cache.delete(key);
+  }
+}
+
+const chartCols = (width) => Math.max(4, width - LABEL_W);
+
 export function getSpan(data, zoom) {
   if (!data) return 30;
   const n = data.days.length;
@@ -65,18 +139,53 @@ export function defaultOffset(data, zoom) {
   return Math.max(0, data.days.length - getSpan(data, zoom));
 }
 
+// Days moved per ←/→ press
+export function panStep(data, zoom) {
+  return Math.floor(getSpan(data, zoom) / 8);
+}
+
+// The day window [off, end) a zoom level and requested offset actually show
+function viewWindow(data, zoom, offset) {
+  const nDays = data.days.length;
+  const span  = getSpan(data, zoom);
+  const off   = Math.max(0, Math.min(offset, nDays - span));
+  return { span, off, end: Math.min(off + span, nDays) };
+}
+
+/**
+ * Fills `cache` with the series for the views one key press away (pan
+ * left/right, zoom in/out), so that press draws from cache.
+ */
+export function prefetchNeighbors(data, { width, zoom, offset, nArtists, cache }) {
+  const nRows  = Math.min(nArtists, data.artists.length);
+  const brCols = chartCols(width) * 2;
+  const views   = [];
+  if (zoom !== 0) {
+    const step = panStep(data, zoom);
+    views.push([zoom, offset - step], [zoom, offset + step]);
+  }
+  // Changing zoom resets the offset to that level's default
+  if (zoom < 4) views.push([zoom + 1, defaultOffset(data, zoom + 1)]);
+  if (zoom > 0) views.push([zoom - 1, defaultOffset(data, zoom - 1)]);
+  for (const [z, o] of views) {
+    const { off, end } = viewWindow(data, z, o);
+    viewSeries(cache, data, nRows, off, end, brCols);
+  }
+  trimCache(cache);
+}
+
 /**
  * Returns array of lines; each line is array of { text, color, bold, dim }.
- * Caller renders these with Ink <Text> spans.
+ * Caller renders these with Ink <Text> spans. `cache` is an optional Map
+ * reused across calls for the same data (see viewSeries).
  */
-export function drawChart(data, { width, height, zoom, offset, nArtists, zoomLabel }) {
+export function drawChart(data, { width, height, zoom, offset, nArtists, zoomLabel, cache }) {
   const days    = data.days;
   const artists = data.artists.slice(0, nArtists);
   const nDays   = days.length;
-  const span    = getSpan(data, zoom);
-  const off     = Math.max(0, Math.min(offset, nDays - span));
+  const { span, off, end: endIdx } = viewWindow(data, zoom, offset);
 
-  const chartW   = Math.max(4, width - LABEL_W);
+  const chartW   = chartCols(width);
   const brCols   = chartW * 2;
   const rowsPer  = artists.length > 0 ? Math.max(2, Math.floor((height - 2) / artists.length)) : 2;
   const brRows   = rowsPer * 4;
@@ -92,47 +201,40 @@ export function drawChart(data, { width, height, zoom, offset, nArtists, zoomLab
     { text: `  ${zoomLabel}  [+/-] zoom  [←→] pan  [[/]] artists (${nArtists})`, dim: true },
   ]);
 
-  // Absolute peak: max daily ms across all artists across all time.
-  // Computed from raw data before any sampling so it never changes as you pan or zoom.
+  // Absolute peak: max daily ms across the shown artists across all time,
+  // so it never changes as you pan or zoom.
   let absolutePeak = 1;
   for (const artist of artists) {
-    for (const v of artist.dailyMs) {
-      if (v > absolutePeak) absolutePeak = v;
-    }
+    if (artist.peakMs > absolutePeak) absolutePeak = artist.peakMs;
   }
 
   // Artist rows
+  const series = viewSeries(cache, data, artists.length, off, endIdx, brCols);
+  const rowCodes = new Uint16Array(chartW);
   for (let ai = 0; ai < artists.length; ai++) {
     const artist = artists[ai];
     const color  = COLORS[ai % COLORS.length];
-    const endIdx = Math.min(off + span, nDays);
-    const visible = artist.dailyMs.slice(off, endIdx);
-    const sampled = gaussianSpread(sampleMax(visible, brCols));
+    const visible = artist.dailyMs.subarray(off, endIdx);
+    const sampled = series.subarray(ai * brCols, (ai + 1) * brCols);
     const peak    = absolutePeak;
 
-    // Build braille grid [rowsPer][chartW]
-    const grid = Array.from({ length: rowsPer }, () => new Uint8Array(chartW));
+    // Braille grid, rowsPer × chartW cells, row-major
+    const grid = new Uint8Array(rowsPer * chartW);
     for (let bc = 0; bc < sampled.length; bc++) {
-      const cc = bc >> 1;
-      const wc = bc & 1;
-      let fill = Math.floor(sampled[bc] / peak * brRows);
-      if (fill < 2) fill = 0;
-      for (let br = brRows - fill; br < brRows; br++) {
-        const cr = br >> 2;
-        const wr = br & 3;
-        if (cr < rowsPer) grid[cr][cc] |= BD[wr][wc];
-      }
+      const fill = Math.min(brRows, Math.floor(sampled[bc] / peak * brRows));
+      if (fill < 2) continue;
+      const cc   = bc >> 1;
+      const from = COL_FROM[bc & 1];
+      const top  = brRows - fill;
+      let cr = top >> 2;
+      grid[cr * chartW + cc] |= from[top & 3];
+      for (cr++; cr < rowsPer; cr++) grid[cr * chartW + cc] |= from[0];
     }
 
-    // Time helpers
-    const fmtMs = ms => {
-      const s = Math.floor(ms / 1000);
-      const h = Math.floor(s / 3600), m = Math.floor((s % 3600) / 60);
-      return h ? `${h}h ${m}m` : `${m}m`;
-    };
-    const totalStr   = fmtMs(artist.totalMs);
-    const visibleMs  = visible.reduce((a, v) => a + v, 0);
-    const visibleStr = fmtMs(visibleMs);
+    const totalStr   = artist.totalStr;
+    let visibleMs = 0;
+    for (let i = 0; i < visible.length; i++) visibleMs += visible[i];
+    const visibleStr = msToHuman(visibleMs);
 
     for (let r = 0; r < rowsPer; r++) {
       const line = [];
@@ -157,34 +259,33 @@ export function drawChart(data, { width, height, zoom, offset, nArtists, zoomLab
       }
 
       // Chart column
-      let chartStr = '';
-      for (let c = 0; c < chartW; c++) {
-        const bits = grid[r][c];
-        chartStr += bits ? String.fromCharCode(0x2800 + bits) : ' ';
-      }
-      line.push({ text: chartStr, color });
+      const rowStart = r * chartW;
+      for (let c = 0; c < chartW; c++) rowCodes[c] = GLYPH_CODES[grid[rowStart + c]];
+      line.push({ text: String.fromCharCode.apply(null, rowCodes), color });
 
       lines.push(line);
     }
   }
 
-  // Year axis
+  if (cache) trimCache(cache);
+
+  // Year axis: labels at the left edge and each 1 January in view
   const axis = new Array(chartW).fill(' ');
-  let prevYear = '';
-  for (let i = off; i < Math.min(off + span, nDays); i++) {
-    const yr = days[i].slice(0, 4);
-    if (yr !== prevYear) {
+  const viewEnd = Math.min(off + span, nDays);
+  if (off < viewEnd) {
+    const t0 = Date.parse(days[off]);
+    let year = Number(days[off].slice(0, 4));
+    for (let i = off; i < viewEnd; ) {
+      const yr = days[i].slice(0, 4);
       const cp = Math.floor((i - off) / span * brCols) >> 1;
       for (let j = 0; j < yr.length; j++) {
         if (cp + j < chartW) axis[cp + j] = yr[j];
       }
-      prevYear = yr;
+      year++;
+      i = off + Math.round((Date.parse(`${year}-01-01`) - t0) / 86400000);
     }
   }
-  lines.push([
-    { text: ' '.repeat(LABEL_W), dim: true },
-    { text: axis.join(''), dim: true },
-  ]);
+  lines.push([{ text: ' '.repeat(LABEL_W) + axis.join(''), dim: true }]);
 
   return lines;
 }
@@ -0,0 +1,38 @@
+import { useState, useRef, useEffect, useCallback } from 'react';
+
+// Applies a request's result only if it's still the latest and the tab is mounted
+export function useLatestRequest() {
+  const seq = useRef(0);
+  const mounted = useRef(true);
+  useEffect(() => () => { mounted.current = false; }, []);
+
+  return useCallback(async (request, apply) => {
+    const id = ++seq.current;
+    const result = await request;
+    if (mounted.current && id === seq.current) apply(result);
+  }, []);
+}
+
+// `values` (primitives), updated at most once per `ms` on leading and trailing
+// edges. A new `resetKey` passes `values` straight through.
+export function useThrottled(values, ms, resetKey) {
+  const [state, setState] = useState({ shown: values, resetKey });
+  const lastShown = useRef(0);
+  let shown = state.shown;
+  if (!Object.is(state.resetKey, resetKey)) {
+    shown = values;
+    setState({ shown, resetKey });
+  }
+  useEffect(() => {
+    if (values.every((v, i) => Object.is(v, shown[i]))) return;
+    const show = () => {
+      lastShown.current = Date.now();
+      setState(s => ({ ...s, shown: values }));
+    };
+    const wait = lastShown.current + ms - Date.now();
+    if (wait <= 0) { show(); return; }
+    const t = setTimeout(show, wait);
+    return () => clearTimeout(t);
+  }, values);
+  return shown;
+}
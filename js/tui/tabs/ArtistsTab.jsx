@@ -1,6 +1,7 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useMemo } from 'react';
 import { Box, Text, useInput } from 'ink';
-import { topArtists, msToHuman } from '../../stats.js';
+import { topArtists, msToHuman, clearStatsCache } from '../../stats.js';
+import { useLatestRequest } from '../hooks.js';
 
 const RANGES = ['7d', '30d', '90d', '365d', 'all'];
 const RANGE_LABELS = { '7d': '7 days', '30d': '30 days', '90d': '90 days', '365d': '1 year', 'all': 'All time' };
@@ -9,23 +10,46 @@ export default function ArtistsTab({ width, height }) {
   const [rangeIdx, setRangeIdx] = useState(1);
   const [artists, setArtists]   = useState(null);
 
-  const load = async (idx) => { setArtists(await topArtists(RANGES[idx], 100)); };
+  const request = useLatestRequest();
+  const load = (idx) => request(topArtists(RANGES[idx], 100), (rows) => {
+    setArtists(rows);
+    // Warm the stats cache for the ranges one [ / ] press away
+    for (const j of [idx - 1, idx + 1]) {
+      if (RANGES[j]) topArtists(RANGES[j], 100).catch(() => {});
+    }
+  });
 
   useEffect(() => { load(rangeIdx); }, []);
 
   useInput((input) => {
     if (input === '[') { const i = Math.max(0, rangeIdx - 1); setRangeIdx(i); load(i); }
     if (input === ']') { const i = Math.min(RANGES.length-1, rangeIdx + 1); setRangeIdx(i); load(i); }
-    if (input === 'r') load(rangeIdx);
+    if (input === 'r') { clearStatsCache(); load(rangeIdx); }
   });
 
+  // Column layout depends only on the width
+  const { nameW, header, divider } = useMemo(() => {
+    const nameW = Math.max(20, Math.min(40, width - 30));
+    return {
+      nameW,
+      header: '#'.padEnd(4) + 'Artist'.padEnd(nameW) + 'Plays'.padEnd(8) + 'Time',
+      divider: '─'.repeat(4 + nameW + 8 + 8),
+    };
+  }, [width]);
+
+  // All rows as one <Text>
+  const body = useMemo(() => artists?.map((a, i) =>
+    String(i+1).padEnd(4) +
+    (a.artistName||'—').slice(0, nameW).padEnd(nameW) +
+    String(a.playCount).padEnd(8) +
+    msToHuman(a.totalMs)
+  ).join('\n'), [artists, nameW]);
+
   if (!artists) return <Box><Text dimColor>  Loading…</Text></Box>;
 
   const prev = rangeIdx > 0 ? RANGE_LABELS[RANGES[rangeIdx-1]] : '';
   const next = rangeIdx < RANGES.length-1 ? RANGE_LABELS[RANGES[rangeIdx+1]] : '';
 
-  const nameW = Math.max(20, Math.min(40, width - 30));
-
   return (
     <Box flexDirection="column" paddingLeft={1}>
       <Text>
@@ -35,16 +59,9 @@ export default function ArtistsTab({ width, height }) {
         {next ? <Text dimColor>  ] {next}</Text> : null}
       </Text>
       <Text> </Text>
-      <Text bold color="white">{'#'.padEnd(4)}{'Artist'.padEnd(nameW)}{'Plays'.padEnd(8)}Time</Text>
-      <Text dimColor>{'─'.repeat(4 + nameW + 8 + 8)}</Text>
-      {artists.map((a, i) => (
-        <Text key={i}>
-          {String(i+1).padEnd(4)}
-          {(a.artistName||'—').slice(0, nameW).padEnd(nameW)}
-          {String(a.playCount).padEnd(8)}
-          {msToHuman(a.totalMs)}
-        </Text>
-      ))}
+      <Text bold color="white">{header}</Text>
+      <Text dimColor>{divider}</Text>
+      <Text>{body}</Text>
     </Box>
   );
 }
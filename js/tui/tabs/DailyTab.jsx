@@ -1,21 +1,31 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useMemo } from 'react';
 import { Box, Text, useInput } from 'ink';
-import { playsForDay, dailyListeningTime, msToHuman } from '../../stats.js';
+import { playsForDay, dailyListeningTime, msToHuman, clearStatsCache } from '../../stats.js';
+import { useLatestRequest } from '../hooks.js';
 
 function fmtDate(d) {
   return d.toLocaleDateString('en-US', { weekday: 'long', year: 'numeric', month: 'long', day: 'numeric' });
 }
 
+// Local HH:MM (toLocaleTimeString with hour12: false gives 24:xx at midnight)
+function fmtTime(playedAt) {
+  const dt = new Date(playedAt);
+  if (Number.isNaN(dt.getTime())) return playedAt?.slice(11, 16) ?? '??:??';
+  return `${String(dt.getHours()).padStart(2, '0')}:${String(dt.getMinutes()).padStart(2, '0')}`;
+}
+
 export default function DailyTab({ width, height }) {
   const [day,   setDay]   = useState(new Date());
   const [plays, setPlays] = useState(null);
   const [total, setTotal] = useState(null);
 
-  const load = async (d) => {
+  const request = useLatestRequest();
+  const load = (d) => {
     const ds = d.toISOString().slice(0, 10);
-    const [p, t] = await Promise.all([playsForDay(ds), dailyListeningTime(ds)]);
-    setPlays(p);
-    setTotal(t);
+    return request(Promise.all([playsForDay(ds), dailyListeningTime(ds)]), ([p, t]) => {
+      setPlays(p);
+      setTotal(t);
+    });
   };
 
   useEffect(() => { load(day); }, []);
@@ -33,13 +43,30 @@ export default function DailyTab({ width, height }) {
       }
     }
     if (input === 't') { const d = new Date(); setDay(d); load(d); }
+    if (input === 'r') { clearStatsCache(); load(day); }
   });
 
-  if (!plays) return <Box><Text dimColor>  Loading…</Text></Box>;
+  // Column layout depends only on the width
+  const timeW = 6;
+  const { trackW, artistW, header, divider } = useMemo(() => {
+    const trackW  = Math.max(20, Math.min(40, width - 50));
+    const artistW = Math.max(15, Math.min(25, width - trackW - 20));
+    return {
+      trackW, artistW,
+      header: 'Time'.padEnd(timeW+2) + 'Track'.padEnd(trackW) + 'Artist'.padEnd(artistW) + 'Dur',
+      divider: '─'.repeat(timeW + 2 + trackW + artistW + 8),
+    };
+  }, [width]);
 
-  const timeW  = 6;
-  const trackW = Math.max(20, Math.min(40, width - 50));
-  const artistW = Math.max(15, Math.min(25, width - trackW - 20));
+  // All rows as one <Text>
+  const body = useMemo(() => plays?.map(p =>
+    fmtTime(p.played_at).padEnd(timeW+2) +
+    (p.track_name||'—').slice(0, trackW).padEnd(trackW) +
+    (p.artist_name||'—').slice(0, artistW).padEnd(artistW) +
+    (p.ms_played ? msToHuman(p.ms_played) : '~3:30')
+  ).join('\n'), [plays, trackW, artistW]);
+
+  if (!plays) return <Box><Text dimColor>  Loading…</Text></Box>;
 
   return (
     <Box flexDirection="column" paddingLeft={1}>
@@ -47,31 +74,14 @@ export default function DailyTab({ width, height }) {
         <Text bold>{fmtDate(day)}</Text>
         {'  '}
         <Text color="cyan">{msToHuman(total ?? 0)}</Text>
-        <Text dimColor>  ← → days · t=today</Text>
+        <Text dimColor>  ← → days · t=today · r=refresh</Text>
       </Text>
       <Text> </Text>
-      <Text bold color="white">
-        {'Time'.padEnd(timeW+2)}{'Track'.padEnd(trackW)}{'Artist'.padEnd(artistW)}Dur
-      </Text>
-      <Text dimColor>{'─'.repeat(timeW + 2 + trackW + artistW + 8)}</Text>
+      <Text bold color="white">{header}</Text>
+      <Text dimColor>{divider}</Text>
       {plays.length === 0
         ? <Text dimColor>  No plays recorded.</Text>
-        : plays.map((p, i) => {
-            let timeStr = p.played_at?.slice(11, 16) ?? '??:??';
-            try {
-              const dt = new Date(p.played_at);
-              timeStr = dt.toLocaleTimeString('en-US', { hour: '2-digit', minute: '2-digit', hour12: false });
-            } catch {}
-            const dur = p.ms_played ? msToHuman(p.ms_played) : '~3:30';
-            return (
-              <Text key={i}>
-                {timeStr.padEnd(timeW+2)}
-                {(p.track_name||'—').slice(0, trackW).padEnd(trackW)}
-                {(p.artist_name||'—').slice(0, artistW).padEnd(artistW)}
-                {dur}
-              </Text>
-            );
-          })
+        : <Text>{body}</Text>
       }
     </Box>
   );
@@ -1,20 +1,28 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useMemo } from 'react';
 import { Box, Text, useInput } from 'ink';
-import { summaryStats, msToHuman } from '../../stats.js';
+import { summaryStats, msToHuman, clearStatsCache } from '../../stats.js';
+import { useLatestRequest } from '../hooks.js';
 
 function Table({ rows, columns }) {
-  const widths = columns.map((col, ci) =>
-    Math.max(col.length, ...rows.map(r => String(r[ci] ?? '').length))
-  );
-  const header = columns.map((col, ci) => col.padEnd(widths[ci])).join('  ');
-  const divider = widths.map(w => '─'.repeat(w)).join('  ');
+  // Stringify every cell once; widths and rendering both reuse it
+  const { cells, widths, header, divider } = useMemo(() => {
+    const cells = rows.map(r => r.map(cell => String(cell ?? '')));
+    const widths = columns.map((col, ci) =>
+      cells.reduce((w, r) => Math.max(w, r[ci].length), col.length)
+    );
+    return {
+      cells, widths,
+      header: columns.map((col, ci) => col.padEnd(widths[ci])).join('  '),
+      divider: widths.map(w => '─'.repeat(w)).join('  '),
+    };
+  }, [rows]);
   return (
     <Box flexDirection="column">
       <Text bold color="white">{header}</Text>
       <Text dimColor>{divider}</Text>
-      {rows.map((row, ri) => (
+      {cells.map((row, ri) => (
         <Text key={ri}>
-          {row.map((cell, ci) => String(cell ?? '').padEnd(widths[ci])).join('  ')}
+          {row.map((cell, ci) => cell.padEnd(widths[ci])).join('  ')}
         </Text>
       ))}
     </Box>
@@ -24,16 +32,21 @@ function Table({ rows, columns }) {
 export default function DashboardTab({ width, height }) {
   const [stats, setStats] = useState(null);
 
-  const load = async () => {
-    setStats(await summaryStats());
-  };
+  const request = useLatestRequest();
+  const load = () => request(summaryStats(), setStats);
 
   useEffect(() => { load(); }, []);
-  useInput((input) => { if (input === 'r') load(); });
+  useInput((input) => { if (input === 'r') { clearStatsCache(); load(); } });
+
+  // Row cells (incl. msToHuman strings) only change when stats reload
+  const artistRows = useMemo(() => stats?.topArtists30d.map((a, i) =>
+    [i+1, a.artistName, a.playCount, msToHuman(a.totalMs)]), [stats]);
+  const trackRows = useMemo(() => stats?.topTracks30d.map((t, i) =>
+    [i+1, (t.trackName||'—').slice(0,30), (t.artistName||'—').slice(0,20), t.playCount, msToHuman(t.totalMs)]), [stats]);
 
   if (!stats) return <Box><Text dimColor>  Loading…</Text></Box>;
 
-  const { todayMs, topArtists30d, topTracks30d, yearly, streaks } = stats;
+  const { todayMs, yearly, streaks } = stats;
 
   return (
     <Box flexDirection="column" paddingLeft={1}>
@@ -46,13 +59,13 @@ export default function DashboardTab({ width, height }) {
       <Text bold color="white">Top Artists — Last 30 Days</Text>
       <Table
         columns={['#', 'Artist', 'Plays', 'Time']}
-        rows={topArtists30d.map((a, i) => [i+1, a.artistName, a.playCount, msToHuman(a.totalMs)])}
+        rows={artistRows}
       />
       <Text> </Text>
       <Text bold color="white">Top Tracks — Last 30 Days</Text>
       <Table
         columns={['#', 'Track', 'Artist', 'Plays', 'Time']}
-        rows={topTracks30d.map((t, i) => [i+1, (t.trackName||'—').slice(0,30), (t.artistName||'—').slice(0,20), t.playCount, msToHuman(t.totalMs)])}
+        rows={trackRows}
       />
       <Text> </Text>
       <Text dimColor>r refresh</Text>
@@ -1,73 +1,100 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef, useMemo } from 'react';
 import { Box, Text, useInput } from 'ink';
-import { drawChart, ZOOM_LABEL, ZOOM_DAYS, getSpan, defaultOffset, COLORS } from '../components/brailleChart.js';
-import { artistDailyHistory } from '../../stats.js';
+import { drawChart, prefetchNeighbors, panStep, ZOOM_LABEL, ZOOM_DAYS, getSpan, defaultOffset, COLORS } from '../components/brailleChart.js';
+import { artistDailyHistory, clearStatsCache } from '../../stats.js';
+import { useLatestRequest, useThrottled } from '../hooks.js';
 
 export default function HistoryTab({ width, height }) {
   const [data,      setData]      = useState(null);
-  const [zoom,      setZoom]      = useState(1);
-  const [offset,    setOffset]    = useState(0);
+  // One state, so a zoom and its offset reset always land together
+  const [view,      setView]      = useState({ zoom: 1, offset: 0 });
   const [nArtists,  setNArtists]  = useState(10);
 
-  const load = useCallback(async () => {
+  const request = useLatestRequest();
+  // drawChart's per-viewport series cache; only valid for the current data
+  const spreadCache = useRef(new Map());
+  const load = useCallback(() => {
     setData(null);
-    const d = await artistDailyHistory(nArtists);
-    setData(d);
-    setOffset(defaultOffset(d, zoom));
-  }, [nArtists]);  // zoom excluded intentionally; offset reset handled in effect
+    return request(artistDailyHistory(nArtists), (d) => {
+      spreadCache.current.clear();
+      setView(v => ({ ...v, offset: defaultOffset(d, v.zoom) }));
+      setData(d);
+    });
+  }, [nArtists]);
 
   useEffect(() => { load(); }, [nArtists]);
 
-  // Reset offset when zoom changes
-  useEffect(() => {
-    if (data) setOffset(defaultOffset(data, zoom));
-  }, [zoom]);
+  // Functional updaters: back-to-back key events each see the previous one
+  const zoomBy = (next) => setView(v => {
+    const zoom = next(v.zoom);
+    return zoom === v.zoom ? v : { zoom, offset: defaultOffset(data, zoom) };
+  });
+  const panBy = (dir) => setView(v => {
+    if (!data || v.zoom === 0) return v;
+    const maxOff = data.days.length - getSpan(data, v.zoom);
+    const offset = Math.max(0, Math.min(maxOff, v.offset + dir * panStep(data, v.zoom)));
+    return offset === v.offset ? v : { ...v, offset };
+  });
 
   useInput((input, key) => {
-    if (input === '+' || input === '=') setZoom(z => Math.min(4, z + 1));
-    if (input === '-') setZoom(z => Math.max(0, z - 1));
-    if (input === '0') { setZoom(0); setOffset(0); }
-    if (input === 'r') load();
+    if (input === '+' || input === '=') zoomBy(z => Math.min(4, z + 1));
+    if (input === '-') zoomBy(z => Math.max(0, z - 1));
+    if (input === '0') zoomBy(() => 0);
+    if (input === 'r') { clearStatsCache(); load(); }
     if (input === ']') setNArtists(n => Math.min(15, n + 1));
     if (input === '[') setNArtists(n => Math.max(3, n - 1));
-    if (key.leftArrow && data && zoom !== 0) {
-      const s = getSpan(data, zoom);
-      setOffset(o => Math.max(0, o - Math.floor(s / 8)));
-    }
-    if (key.rightArrow && data && zoom !== 0) {
-      const n = data.days.length;
-      const s = getSpan(data, zoom);
-      setOffset(o => Math.min(n - s, o + Math.floor(s / 8)));
-    }
+    if (key.leftArrow)  panBy(-1);
+    if (key.rightArrow) panBy(1);
   });
 
+  // Draw at most every 50ms while keys repeat
+  const [shown] = useThrottled([view], 50, data);
+  const { zoom: viewZoom, offset: viewOffset } = shown;
+
+  // Once a frame is on screen, warm the cache for the next likely key press
+  useEffect(() => {
+    if (!data) return;
+    const t = setTimeout(() => prefetchNeighbors(data, {
+      width, zoom: viewZoom, offset: viewOffset, nArtists, cache: spreadCache.current,
+    }), 0);
+    return () => clearTimeout(t);
+  }, [data, width, viewZoom, viewOffset, nArtists]);
+
+  // Redrawn only when one of these changes
+  const chart = useMemo(() => {
+    if (!data) return null;
+    const lines = drawChart(data, {
+      width, height,
+      zoom: viewZoom, offset: viewOffset,
+      nArtists,
+      zoomLabel: ZOOM_LABEL[viewZoom],
+      cache: spreadCache.current,
+    });
+
+    // One <Text> per line, segments as nested inline spans
+    return (
+      <Box flexDirection="column">
+        {lines.map((segments, i) => (
+          <Text key={i}>
+            {segments.map((seg, j) => (
+              <Text
+                key={j}
+                color={seg.color}
+                bold={seg.bold ?? false}
+                dimColor={seg.dim ?? false}
+              >
+                {seg.text}
+              </Text>
+            ))}
+          </Text>
+        ))}
+      </Box>
+    );
+  }, [data, width, height, viewZoom, viewOffset, nArtists]);
+
   if (!data) {
     return <Box><Text dimColor>  Loading history…</Text></Box>;
   }
 
-  const lines = drawChart(data, {
-    width, height,
-    zoom, offset,
-    nArtists,
-    zoomLabel: ZOOM_LABEL[zoom],
-  });
-
-  return (
-    <Box flexDirection="column">
-      {lines.map((segments, i) => (
-        <Box key={i}>
-          {segments.map((seg, j) => (
-            <Text
-              key={j}
-              color={seg.color}
-              bold={seg.bold ?? false}
-              dimColor={seg.dim ?? false}
-            >
-              {seg.text}
-            </Text>
-          ))}
-        </Box>
-      ))}
-    </Box>
-  );
+  return chart;
 }
@@ -15,4 +15,83 @@ CREATE TABLE IF NOT EXISTS sync_state (
   value TEXT NOT NULL
 );
 
-CREATE INDEX IF NOT EXISTS idx_plays_played_at ON plays(played_at);
+-- played_at range scans (playsForDay, the partial first day of a rolling
+-- range) read ms_played from the index. idx_plays_track serves the Apple
+-- artist backfill's track_name lookups. The artist and day indexes were
+-- superseded by plays_daily below.
+DROP INDEX IF EXISTS idx_plays_played_at;
+DROP INDEX IF EXISTS idx_plays_artist;
+DROP INDEX IF EXISTS idx_plays_day;
+DROP INDEX IF EXISTS idx_plays_day_ms;
+CREATE INDEX IF NOT EXISTS idx_plays_played_at_ms ON plays(played_at, ms_played);
+CREATE INDEX IF NOT EXISTS idx_plays_track ON plays(track_name, artist_name, played_at, ms_played);
+
+-- Daily rollup the stats queries aggregate instead of plays: one row per
+-- (day, artist, track). known_ms sums the recorded durations, and
+-- null_ms_count counts plays without one. Queries cost those plays at
+-- DEFAULT_MS_PER_PLAY, so the constant never gets baked into stored totals.
+-- The triggers below keep it in step with every insert, update and delete.
+-- Names may be NULL, which UNIQUE and ON CONFLICT treat as distinct, so the
+-- triggers match keys with IS and update-or-insert by hand.
+CREATE TABLE IF NOT EXISTS plays_daily (
+  day TEXT NOT NULL,
+  artist_name TEXT,
+  track_name TEXT,
+  play_count INTEGER NOT NULL,
+  known_ms INTEGER NOT NULL,
+  null_ms_count INTEGER NOT NULL
+);
+-- Each access path is covering: by day (also the triggers' key lookup), by
+-- artist and by track.
+CREATE INDEX IF NOT EXISTS idx_plays_daily_day
+  ON plays_daily(day, artist_name, track_name, play_count, known_ms, null_ms_count);
+CREATE INDEX IF NOT EXISTS idx_plays_daily_artist
+  ON plays_daily(artist_name, day, play_count, known_ms, null_ms_count);
+CREATE INDEX IF NOT EXISTS idx_plays_daily_track
+  ON plays_daily(track_name, artist_name, play_count, known_ms, null_ms_count);
+
+-- One-time backfill when the rollup is first created (no-op once populated)
+INSERT INTO plays_daily (day, artist_name, track_name, play_count, known_ms, null_ms_count)
+  SELECT date(played_at), artist_name, track_name,
+         COUNT(*), IFNULL(SUM(ms_played), 0), SUM(ms_played IS NULL)
+  FROM plays WHERE NOT EXISTS (SELECT 1 FROM plays_daily)
+  GROUP BY date(played_at), artist_name, track_name;
+
+CREATE TRIGGER IF NOT EXISTS plays_daily_insert AFTER INSERT ON plays BEGIN
+  UPDATE plays_daily SET play_count = play_count + 1,
+         known_ms = known_ms + IFNULL(NEW.ms_played, 0),
+         null_ms_count = null_ms_count + (NEW.ms_played IS NULL)
+   WHERE day = date(NEW.played_at) AND artist_name IS NEW.artist_name AND track_name IS NEW.track_name;
+  INSERT INTO plays_daily (day, artist_name, track_name, play_count, known_ms, null_ms_count)
+  SELECT date(NEW.played_at), NEW.artist_name, NEW.track_name, 1, IFNULL(NEW.ms_played, 0), NEW.ms_played IS NULL
+   WHERE changes() = 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS plays_daily_delete AFTER DELETE ON plays BEGIN
+  UPDATE plays_daily SET play_count = play_count - 1,
+         known_ms = known_ms - IFNULL(OLD.ms_played, 0),
+         null_ms_count = null_ms_count - (OLD.ms_played IS NULL)
+   WHERE day = date(OLD.played_at) AND artist_name IS OLD.artist_name AND track_name IS OLD.track_name;
+  DELETE FROM plays_daily
+   WHERE day = date(OLD.played_at) AND artist_name IS OLD.artist_name AND track_name IS OLD.track_name
+     AND play_count = 0;
+END;
+
+-- An update moves the play from its old key to its new one
+CREATE TRIGGER IF NOT EXISTS plays_daily_update
+AFTER UPDATE OF played_at, artist_name, track_name, ms_played ON plays BEGIN
+  UPDATE plays_daily SET play_count = play_count - 1,
+         known_ms = known_ms - IFNULL(OLD.ms_played, 0),
+         null_ms_count = null_ms_count - (OLD.ms_played IS NULL)
+   WHERE day = date(OLD.played_at) AND artist_name IS OLD.artist_name AND track_name IS OLD.track_name;
+  DELETE FROM plays_daily
+   WHERE day = date(OLD.played_at) AND artist_name IS OLD.artist_name AND track_name IS OLD.track_name
+     AND play_count = 0;
+  UPDATE plays_daily SET play_count = play_count + 1,
+         known_ms = known_ms + IFNULL(NEW.ms_played, 0),
+         null_ms_count = null_ms_count + (NEW.ms_played IS NULL)
+   WHERE day = date(NEW.played_at) AND artist_name IS NEW.artist_name AND track_name IS NEW.track_name;
+  INSERT INTO plays_daily (day, artist_name, track_name, play_count, known_ms, null_ms_count)
+  SELECT date(NEW.played_at), NEW.artist_name, NEW.track_name, 1, IFNULL(NEW.ms_played, 0), NEW.ms_played IS NULL
+   WHERE changes() = 0;
+END;
@@ -1,3 +1,17 @@
+// Spotify timestamps are fixed-width "YYYY-MM-DDTHH:MM:SS[.sss]Z", so slice
+// the fields directly; anything else falls back to Date.parse.
+function tsToMs(s) {
+  if ((s.length === 24 || s.length === 20) && s[10] === 'T' && s[s.length - 1] === 'Z') {
+    const mo = +s.slice(5, 7), d = +s.slice(8, 10);
+    const h = +s.slice(11, 13), mi = +s.slice(14, 16), sec = +s.slice(17, 19);
+    if (mo >= 1 && mo <= 12 && d >= 1 && d <= 31 && h < 24 && mi < 60 && sec < 60) {
+      const ms = Date.UTC(+s.slice(0, 4), mo - 1, d, h, mi, sec, s.length === 24 ? +s.slice(20, 23) : 0);
+      if (!Number.isNaN(ms)) return ms;
+    }
+  }
+  return Date.parse(s);
+}
+
 export default {
   async scheduled(event, env, ctx) {
     // 1. Refresh Spotify access token
@@ -30,7 +44,7 @@ export default {
     // 3. Fetch recently played tracks
     const url = new URL('https://api.spotify.com/v1/me/player/recently-played');
     url.searchParams.set('limit', '50');
-    if (cursor) url.searchParams.set('after', String(new Date(cursor).getTime()));
+    if (cursor) url.searchParams.set('after', String(tsToMs(cursor)));
 
     const recentRes = await fetch(url.toString(), {
       headers: { 'Authorization': `Bearer ${access_token}` },
@@ -41,38 +55,42 @@ export default {
       return;
     }
 
-    const { items } = await recentRes.json();
+    // The cursor comparison is at ms resolution, so the page can still contain
+    // the cursor's own play (or older ones); drop those before touching D1.
+    const items = ((await recentRes.json()).items || [])
+      .filter(it => !cursor || it.played_at > cursor);
 
-    if (!items || items.length === 0) {
+    if (items.length === 0) {
       console.log('No new tracks since last poll.');
       return;
     }
 
-    // 4. Batch insert via D1 binding
+    // 4. Batch insert + cursor update via D1 binding (one transaction).
+    //    Cursor = newest item's played_at; items are usually newest-first,
+    //    but take the max rather than relying on it.
+    let newest = items[0].played_at;
+    for (const item of items) if (item.played_at > newest) newest = item.played_at;
+
+    const insert = env.DB.prepare('INSERT OR IGNORE INTO plays (played_at, track_uri, track_name, artist_name, album_name, source) VALUES (?, ?, ?, ?, ?, ?)');
     const stmts = items.map(item => {
       const track = item.track;
-      return env.DB
-        .prepare('INSERT OR IGNORE INTO plays (played_at, track_uri, track_name, artist_name, album_name, source) VALUES (?, ?, ?, ?, ?, ?)')
-        .bind(
-          item.played_at,
-          track.uri,
-          track.name,
-          track.artists[0]?.name ?? null,
-          track.album?.name ?? null,
-          'api',
-        );
+      return insert.bind(
+        item.played_at,
+        track.uri,
+        track.name,
+        track.artists[0]?.name ?? null,
+        track.album?.name ?? null,
+        'api',
+      );
     });
+    stmts.push(
+      env.DB
+        .prepare('INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)')
+        .bind('last_poll_cursor', newest),
+    );
 
     await env.DB.batch(stmts);
     console.log(`Processed ${items.length} tracks.`);
-
-    // 5. Update cursor to newest item's played_at (items are newest-first)
-    const newest = items[0].played_at;
-    await env.DB
-      .prepare('INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)')
-      .bind('last_poll_cursor', newest)
-      .run();
-
     console.log(`Cursor updated to ${newest}`);
   },
 };